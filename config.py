@@ -1,11 +1,18 @@
+import functools
 import os
+from pathlib import Path
+
 from dotenv import load_dotenv
 
-# Try to load from .env file if it exists (local development)
-load_dotenv()
+# Try to load from .env file if it exists (local development), next to this
+# file so it's found no matter where the bot is started from
+_env = Path(__file__).with_name(".env")
+if _env.exists():
+    load_dotenv(_env)
 
 
 # Function to get required environment variables
+@functools.cache
 def get_token():
     token = os.getenv("DISCORD_BOT_TOKEN")
     if not token:
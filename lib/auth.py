@@ -4,20 +4,97 @@ are authorized to do so.
 """
 
 import logging
+import time
 
+import discord
 from discord.ext import commands
 
 logger = logging.getLogger(__name__)
 
+BOT_ADMIN_ROLE = "BotAdmin"
+
+# how long a user's authorization result is reused, in seconds
+AUTHZ_TTL: float = 60
+# most authorization results kept at once
+AUTHZ_CACHE_SIZE: int = 256
+
+# guild id -> ids of the roles granting access to bot commands
+_bot_admin_role_ids: dict[int, frozenset[int]] = {}
+
+# (guild id, user id) -> (time.monotonic() the entry expires, result), oldest
+# entries first
+_authz_cache: dict[tuple[int, int], tuple[float, bool]] = {}
+
+
+def get_bot_admin_role_ids(guild: discord.Guild) -> frozenset[int]:
+    """Return the ids of the BotAdmin roles of a guild, cached per guild."""
+
+    role_ids = _bot_admin_role_ids.get(guild.id)
+
+    if role_ids is None:
+        role_ids = frozenset(
+            role.id for role in guild.roles if role.name == BOT_ADMIN_ROLE
+        )
+        _bot_admin_role_ids[guild.id] = role_ids
+
+    return role_ids
+
 
 async def can_run_bot_commands(ctx: commands.Context[commands.Bot]) -> bool:
     """Check if the user can run bot commands."""
 
+    if ctx.guild is None or not isinstance(ctx.author, discord.Member):
+        return False
+
+    key = (ctx.guild.id, ctx.author.id)
+    now = time.monotonic()
+
+    cached = _authz_cache.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
     logger.info(
-        f"Checking if {ctx.author} can run bot commands, roles: {ctx.author.roles}"
+        "Checking if %s can run bot commands, roles: %s",
+        ctx.author,
+        ctx.author.roles,
     )
 
-    if [role for role in ctx.author.roles if role.name == "BotAdmin"]:
-        return True
+    allowed = not get_bot_admin_role_ids(ctx.guild).isdisjoint(
+        role.id for role in ctx.author.roles
+    )
+    cache_authz(key, now, allowed)
+
+    return allowed
+
+
+def cache_authz(key: tuple[int, int], now: float, allowed: bool) -> None:
+    """Store an authorization result, dropping expired and the oldest entries."""
+    # re-inserting moves the key to the end, entries then stay ordered by age
+    # and the expired ones are always at the front
+    _ = _authz_cache.pop(key, None)
+
+    while _authz_cache:
+        oldest = next(iter(_authz_cache))
+        if _authz_cache[oldest][0] > now and len(_authz_cache) < AUTHZ_CACHE_SIZE:
+            break
+        del _authz_cache[oldest]
+
+    _authz_cache[key] = (now + AUTHZ_TTL, allowed)
+
+
+async def forget_guild_roles(role: discord.Role, *_roles: discord.Role) -> None:
+    """Drop the cached BotAdmin roles of the guild a role belongs to."""
+    _ = _bot_admin_role_ids.pop(role.guild.id, None)
+    _authz_cache.clear()
+
+
+async def forget_member(_before: discord.Member, after: discord.Member) -> None:
+    """Drop the cached authorization of a member, e.g. after a role change."""
+    _ = _authz_cache.pop((after.guild.id, after.id), None)
+
 
-    return False
+async def setup(bot: commands.Bot):
+    bot.add_listener(forget_guild_roles, "on_guild_role_create")
+    bot.add_listener(forget_guild_roles, "on_guild_role_update")
+    bot.add_listener(forget_guild_roles, "on_guild_role_delete")
+    bot.add_listener(forget_member, "on_member_update")
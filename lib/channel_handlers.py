@@ -0,0 +1,49 @@
+"""
+Routes messages to the cogs that are running something in a channel.
+
+Cogs register a handler while they are active instead of listening to every
+message, so the bot looks up the handlers of a channel once per message.
+"""
+
+import asyncio
+from typing import Awaitable, Callable
+
+import discord
+
+Handler = Callable[[discord.Message], Awaitable[None]]
+
+# channel id -> handlers of the cogs active in that channel
+_handlers: dict[int, tuple[Handler, ...]] = {}
+
+
+def register(channel_id: int, handler: Handler) -> None:
+    """Call handler for every message sent to a channel, once."""
+    handlers = _handlers.get(channel_id, ())
+
+    if handler not in handlers:
+        _handlers[channel_id] = handlers + (handler,)
+
+
+def unregister(channel_id: int, handler: Handler) -> None:
+    """Stop calling handler for messages sent to a channel."""
+    handlers = tuple(h for h in _handlers.get(channel_id, ()) if h != handler)
+
+    if handlers:
+        _handlers[channel_id] = handlers
+    else:
+        _ = _handlers.pop(channel_id, None)
+
+
+async def dispatch(message: discord.Message) -> None:
+    """Pass a message to the handlers registered for its channel."""
+    handlers = _handlers.get(message.channel.id)
+
+    if handlers is None:
+        return
+
+    if len(handlers) == 1:
+        await handlers[0](message)
+        return
+
+    # several cogs can be active in the same channel, don't let one wait on the other
+    _ = await asyncio.gather(*(handler(message) for handler in handlers))
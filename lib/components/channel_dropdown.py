@@ -1,36 +1,67 @@
-from typing import Awaitable, Callable, List, Optional
+import functools
+from typing import Awaitable, Callable, List, Optional, Tuple
 
 import discord
 from discord.ui import Select, View
 
 
+@functools.lru_cache(maxsize=32)
+def _build_options(
+    channels: Tuple[Tuple[int, str], ...],
+) -> Tuple[discord.SelectOption, ...]:
+    return tuple(
+        discord.SelectOption(
+            label=name,
+            value=str(channel_id),
+            description=f"#{name}",
+        )
+        for channel_id, name in channels
+    )
+
+
+def channel_options(channels: List[discord.TextChannel]) -> List[discord.SelectOption]:
+    """
+    Build the dropdown options for a list of channels.
+
+    Options are cached by channel ids and names, so renamed, added or
+    removed channels produce a fresh set of options.
+    """
+    return list(
+        _build_options(
+            # Discord limits to 25 options
+            tuple((channel.id, channel.name) for channel in channels[:25])
+        )
+    )
+
+
 class ChannelDropdown(View):
     """A dropdown view that allows users to select a channel."""
 
     def __init__(
         self,
-        channels: List[discord.TextChannel],
+        channels: Optional[List[discord.TextChannel]] = None,
         placeholder: str = "Select a channel",
         callback: Optional[
             Callable[[discord.Interaction, discord.TextChannel], Awaitable[None]]
         ] = None,
         timeout: float = 180.0,
+        options: Optional[List[discord.SelectOption]] = None,
     ):
+        """
+        :param channels: The channels to choose from.
+        :param options: Pre-built options, used instead of ``channels`` if given.
+        """
         super().__init__(timeout=timeout)
 
+        if options is None:
+            options = channel_options(channels or [])
+
         # Create the dropdown menu
         self.dropdown = Select(
             placeholder=placeholder,
             min_values=1,
             max_values=1,
-            options=[
-                discord.SelectOption(
-                    label=channel.name,
-                    value=str(channel.id),
-                    description=f"#{channel.name}",
-                )
-                for channel in channels[:25]  # Discord limits to 25 options
-            ],
+            options=list(options),
         )
 
         self.selected_channel: Optional[discord.TextChannel] = None
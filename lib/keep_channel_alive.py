@@ -1,28 +1,79 @@
+import asyncio
+import functools
 import logging
 import math
 import random
+import time
+from collections import Counter
 from datetime import datetime
-from typing import cast
+from typing import override
 
 import discord
 from discord.ext import commands, tasks
 
+from lib import channel_handlers
+from lib.components.channel_dropdown import channel_options
 from lib.embeds import error
+from lib.rest import send_all
 from lib.views.start_keep_alive import StartKeepChannelAliveView
 
 logger = logging.getLogger(__name__)
 
 DURATION: int = 60
 
-reminders = [
-    (
-        DURATION / 2,
-        "You are at risk of losing your reward of {reward}. Send a message to keep it alive",
-    ),
-]
+# an edit stuck on rate limits must not outlive the 5 second keep_alive tick
+STATUS_EDIT_TIMEOUT: float = 4.5
+
+# sorted by threshold, keep_alive sends them in order
+reminders = sorted(
+    [
+        (
+            DURATION / 2,
+            "You are at risk of losing your reward of {reward}. Send a message to keep it alive",
+        ),
+    ]
+)
 
 MemberId = int
-MessageCount = int
+
+# static replies, built once instead of on every command
+NO_ACTIVE_CHALLENGE_EMBED = error("No active message train challenge to cancel.")
+NO_CHANNELS_EMBED = error(
+    "No channels available to send messages to.",
+    title="No Channels Available",
+)
+
+# positions of the fields updated on every tick in the status embed
+STATUS_FIELD_TIME = 1
+STATUS_FIELD_PARTICIPANTS = 2
+STATUS_FIELD_PROGRESS = 3
+
+BAR_LENGTH: int = 20
+
+# progress bar segment per color bucket, see get_color_bucket
+BAR_COLORS = ("🟩", "🟨", "🟥")
+EMPTY_COLOR = "⬜"
+
+
+def get_color_bucket(remaining_time: float) -> int:
+    """Return 0 (green), 1 (yellow) or 2 (red) based on the remaining time"""
+    if remaining_time > DURATION / 2:
+        # More than 50% time remaining - green
+        return 0
+    elif remaining_time > DURATION / 4:
+        # More than 25% time remaining - yellow
+        return 1
+    else:
+        # Less than 25% time remaining - red
+        return 2
+
+
+@functools.lru_cache(maxsize=64)
+def render_bar(filled_length: int, color_bucket: int) -> str:
+    """Render a progress bar, there are only a few distinct ones so cache them"""
+    return BAR_COLORS[color_bucket] * filled_length + EMPTY_COLOR * (
+        BAR_LENGTH - filled_length
+    )
 
 
 class KeepChannelAlive(commands.Cog):
@@ -30,13 +81,29 @@ class KeepChannelAlive(commands.Cog):
 
     active: bool
     channel_id: int | None
+    channel: discord.TextChannel | None
     reward: str
-    last_message: datetime | None
+    # time.monotonic() of the last message, used for all elapsed time math
+    last_message_mono: float | None
     started_at: datetime | None
-    last_reminder: int | None
-    participants: dict[MemberId, MessageCount]
+    # reminders with the reward of the current challenge filled in
+    _reminders: list[tuple[float, str]]
+    # index into _reminders of the next reminder to send
+    _next_reminder_idx: int
+    participants: Counter[MemberId]
 
     status_message: discord.Message | None
+    # built once per challenge, update_status_message only swaps values
+    _status_embed: discord.Embed | None
+    # guild id -> (the bot's role ids, options for the channels it can send
+    # messages to with those roles)
+    _channel_option_cache: dict[int, tuple[tuple[int, ...], list[discord.SelectOption]]]
+    _dirty: bool
+    _edit_lock: asyncio.Lock
+    # what the status message currently shows, see update_status_message
+    _last_sig: tuple[int, int, int, int] | None
+    # progress bucket and participant count seen by the last keep_alive tick
+    _last_tick_sig: tuple[int, int] | None
 
     def get_duration_text(self):
         """Return a formatted string of how long the challenge has been running"""
@@ -53,67 +120,84 @@ class KeepChannelAlive(commands.Cog):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self._edit_lock = asyncio.Lock()
+        self._channel_option_cache = {}
+        self.channel_id = None
+
+        self.reset()
 
+    @override
+    async def cog_unload(self) -> None:
+        # drops the channel handler along with the challenge
         self.reset()
 
     def reset(self):
+        if self.channel_id is not None:
+            channel_handlers.unregister(self.channel_id, self.on_channel_message)
+
         self.active = False
         self.channel_id = None
+        self.channel = None
         self.reward = ""
-        self.last_message = None
+        self.last_message_mono = None
         self.started_at = None
         self.keep_alive.stop()
-        self.last_reminder = None
+        self.flush_status.stop()
+        self._reminders = []
+        self._next_reminder_idx = 0
         self.status_message = None
-        self.participants = {}
+        self._status_embed = None
+        self.participants = Counter()
+        self._dirty = False
+        self._last_sig = None
+        self._last_tick_sig = None
 
     def get_color_based_on_time(self, remaining_time: float):
         """Return a color based on the remaining time"""
-        if remaining_time > DURATION / 2:
-            # More than 50% time remaining - green
+        color_bucket = get_color_bucket(remaining_time)
+
+        if color_bucket == 0:
             return discord.Color.green()
-        elif remaining_time > DURATION / 4:
-            # More than 25% time remaining - yellow
+        elif color_bucket == 1:
             return discord.Color.gold()
         else:
-            # Less than 25% time remaining - red
             return discord.Color.red()
 
-    def progress(self):
+    def progress(self, elapsed: float | None = None):
+        """Render the progress bar, pass elapsed if the caller already has it"""
         if not self.active:
             return ""
 
-        if self.last_message is None:
+        if self.last_message_mono is None:
             return ""
 
-        elapsed = (datetime.now() - self.last_message).total_seconds()
+        if elapsed is None:
+            elapsed = time.monotonic() - self.last_message_mono
 
         if elapsed > DURATION:
             return "Message train has ended"
 
-        # Create a visual progress bar with 20 segments
-        bar_length = 20
-        filled_length = int(bar_length * elapsed / DURATION)
-
-        # Determine the color based on remaining time
-        if DURATION - elapsed > DURATION / 2:
-            # More than 50% time remaining - green
-            bar_color = "🟩"
-            empty_color = "⬜"
-        elif DURATION - elapsed > DURATION / 4:
-            # More than 25% time remaining - yellow
-            bar_color = "🟨"
-            empty_color = "⬜"
-        else:
-            # Less than 25% time remaining - red
-            bar_color = "🟥"
-            empty_color = "⬜"
+        # Create a visual progress bar with BAR_LENGTH segments
+        filled_length = int(BAR_LENGTH * elapsed / DURATION)
 
-        progress_bar = bar_color * filled_length + empty_color * (
-            bar_length - filled_length
+        return render_bar(filled_length, get_color_bucket(DURATION - elapsed))
+
+    def build_status_embed(self) -> discord.Embed:
+        """Build the status embed, the ticking fields are filled in on update"""
+        embed = discord.Embed(
+            title="🚂 Message Train Challenge",
+            description="Keep the conversation going to win the reward!",
         )
 
-        return progress_bar
+        _ = embed.add_field(name="🎁 Reward", value=self.reward, inline=False)
+        _ = embed.add_field(name="⏱️ Time Remaining", value="", inline=True)
+        _ = embed.add_field(name="👥 Participants", value="", inline=True)
+        _ = embed.add_field(name="Progress", value="", inline=False)
+
+        # Add a footer with instructions
+        _ = embed.set_footer(text="Send a message to keep the train alive!")
+
+        return embed
 
     async def update_status_message(self):
         if self.status_message is None:
@@ -124,62 +208,58 @@ class KeepChannelAlive(commands.Cog):
             logger.warning("No channel id")
             return
 
-        if self.last_message is None:
-            logger.warning("No started at")
+        if self.last_message_mono is None:
+            logger.warning("No last message")
             return
 
-        channel = self.bot.get_channel(self.channel_id)
-
-        if channel is None:
-            logger.warning("Channel not found")
+        if self._status_embed is None:
+            logger.warning("No status embed")
             return
 
-        channel = cast(discord.TextChannel, channel)
-
-        message = await channel.fetch_message(self.status_message.id)
-
-        elapsed = (datetime.now() - self.last_message).total_seconds()
+        elapsed = time.monotonic() - self.last_message_mono
         remaining_time = max(0, DURATION - elapsed)
 
-        # Create a list of participants with their message counts
-        participant_list: list[str] = []
-        for user_id, count in self.participants.items():
-            participant_list.append(f"<@{user_id}> - {count} messages")
-
-        # Create an embed for the status message
-        embed = discord.Embed(
-            title="🚂 Message Train Challenge",
-            description="Keep the conversation going to win the reward!",
-            color=self.get_color_based_on_time(remaining_time),
+        # skip the edit if the message would look exactly the same
+        sig = (
+            int(BAR_LENGTH * elapsed / DURATION),
+            get_color_bucket(remaining_time),
+            len(self.participants),
+            math.trunc(remaining_time),
         )
+        if sig == self._last_sig:
+            return
 
-        _ = embed.add_field(name="🎁 Reward", value=self.reward, inline=False)
+        embed = self._status_embed
+        embed.color = self.get_color_based_on_time(remaining_time)
 
-        _ = embed.add_field(
+        _ = embed.set_field_at(
+            STATUS_FIELD_TIME,
             name="⏱️ Time Remaining",
             value=f"{math.trunc(remaining_time)} seconds",
             inline=True,
         )
 
-        _ = embed.add_field(
+        _ = embed.set_field_at(
+            STATUS_FIELD_PARTICIPANTS,
             name="👥 Participants",
-            value=f"{len(self.participants.keys())} active",
+            value=f"{len(self.participants)} active",
             inline=True,
         )
 
-        _ = embed.add_field(name="Progress", value=self.progress(), inline=False)
-
-        # Add a footer with instructions
-        _ = embed.set_footer(text="Send a message to keep the train alive!")
+        _ = embed.set_field_at(
+            STATUS_FIELD_PROGRESS,
+            name="Progress",
+            value=self.progress(elapsed),
+            inline=False,
+        )
 
-        _ = await message.edit(content=None, embed=embed)
+        _ = await self.status_message.edit(content=None, embed=embed)
+        self._last_sig = sig
 
     @commands.command()
     async def cancel(self, ctx: commands.Context[commands.Bot]):
         if not self.active:
-            _ = await ctx.reply(
-                embed=error("No active message train challenge to cancel.")
-            )
+            _ = await ctx.reply(embed=NO_ACTIVE_CHALLENGE_EMBED)
             return
 
         self.reset()
@@ -202,10 +282,14 @@ class KeepChannelAlive(commands.Cog):
 
         self.active = True
         self.channel_id = target_channel.id
+        self.channel = target_channel
+        channel_handlers.register(target_channel.id, self.on_channel_message)
         self.reward = reward
-        self.last_message = datetime.now()
+        self._reminders = [(t, msg.format(reward=reward)) for t, msg in reminders]
+        self.last_message_mono = time.monotonic()
         self.started_at = datetime.now()
         _ = self.keep_alive.start()
+        _ = self.flush_status.start()
 
         # Create an initial embed
         initial_embed = discord.Embed(
@@ -221,12 +305,13 @@ class KeepChannelAlive(commands.Cog):
         )
         _ = initial_embed.add_field(
             name="📝 Instructions",
-            value="Keep sending messages to keep the train alive. If no one sends a message for 60 seconds, the train stops and a random participant wins!",
+            value="Keep sending messages to keep the train alive. If no one sends a message for 60 seconds, the train stops and a random participant wins. Every message is a ticket, so the more you send the better your odds!",
             inline=False,
         )
         _ = initial_embed.set_footer(text="Good luck!")
 
         self.status_message = await target_channel.send(embed=initial_embed)
+        self._status_embed = self.build_status_embed()
 
         await self.update_status_message()
 
@@ -236,7 +321,7 @@ class KeepChannelAlive(commands.Cog):
     ):
         # ensure we're in a text channel
         if ctx.channel.type != discord.ChannelType.text:
-            logging.warning(
+            logger.warning(
                 "Command start can only be used in a text channel, got %s and not %s",
                 ctx.channel.type,
                 discord.TextChannel.type,
@@ -265,27 +350,21 @@ class KeepChannelAlive(commands.Cog):
 
         reward = " ".join(rewards)
 
+        if ctx.guild is None:
+            return
+
         # Show a dropdown to select a channel
-        channels: list[discord.TextChannel] = [
-            ch
-            for ch in (ctx.guild.text_channels if ctx.guild else [])
-            if ctx.guild and ch.permissions_for(ctx.guild.me).send_messages
-        ]
+        options = self.get_channel_options(ctx.guild)
 
-        if not channels:
-            _ = await ctx.reply(
-                embed=error(
-                    "No channels available to send messages to.",
-                    title="No Channels Available",
-                )
-            )
+        if not options:
+            _ = await ctx.reply(embed=NO_CHANNELS_EMBED)
             return
 
         view = StartKeepChannelAliveView(
             reward=reward,
-            channels=channels,
             callback=self.on_start,
             timeout=180.0,
+            options=options,
         )
 
         start_embed = discord.Embed(
@@ -310,63 +389,112 @@ class KeepChannelAlive(commands.Cog):
 
         _ = await ctx.reply(embed=start_embed, view=view)
 
+    def get_channel_options(self, guild: discord.Guild) -> list[discord.SelectOption]:
+        """Return the dropdown options for channels the bot can send messages to"""
+        me = guild.me
+        # the bot's roles decide which channels it can send messages to. Compare
+        # them on lookup, without the members intent on_member_update can't be
+        # relied on to report changes to them
+        role_ids = tuple(role.id for role in me.roles)
+
+        cached = self._channel_option_cache.get(guild.id)
+        if cached is not None and cached[0] == role_ids:
+            return cached[1]
+
+        base = me.guild_permissions
+
+        if base.administrator:
+            channels = guild.text_channels
+        else:
+            # without overwrites the guild permissions apply as they are
+            base_send = base.view_channel and base.send_messages
+            channels = [
+                ch
+                for ch in guild.text_channels
+                if (
+                    ch.permissions_for(me).send_messages if ch.overwrites else base_send
+                )
+            ]
+
+        options = channel_options(channels)
+        self._channel_option_cache[guild.id] = (role_ids, options)
+
+        return options
+
+    def forget_channel_options(self, guild: discord.Guild):
+        _ = self._channel_option_cache.pop(guild.id, None)
+
     @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        if not self.active:
-            return
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
+        self.forget_channel_options(channel.guild)
 
-        if message.channel.id != self.channel_id:
-            return
+    @commands.Cog.listener()
+    async def on_guild_channel_update(
+        self, _before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
+    ):
+        self.forget_channel_options(after.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        self.forget_channel_options(channel.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role: discord.Role):
+        self.forget_channel_options(role.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, _before: discord.Role, after: discord.Role):
+        self.forget_channel_options(after.guild)
 
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        self.forget_channel_options(role.guild)
+
+    async def on_channel_message(self, message: discord.Message):
+        # only registered for the challenge channel while it's active
         if message.author.bot:
             return
 
-        if message.author.id not in self.participants:
-            self.participants[message.author.id] = 0
         self.participants[message.author.id] += 1
 
         logger.info("staying alive with new message")
 
-        # restart so that we stay on the 5-second interval
-        self.keep_alive.restart()
-        self.last_message = datetime.now()
-        self.last_reminder = None
-        await self.update_status_message()
+        self.last_message_mono = time.monotonic()
+        self._next_reminder_idx = 0
+        # coalesce edits, flush_status picks this up on its next tick
+        self._dirty = True
 
     @tasks.loop(seconds=5)
     async def keep_alive(self):
         if not self.active:
             return
 
-        if self.last_message is None:
+        if self.last_message_mono is None:
             return
 
-        if self.channel_id is None:
+        if self.channel is None:
             return
 
-        await self.update_status_message()
-
-        elapsed = (datetime.now() - self.last_message).total_seconds()
+        elapsed = time.monotonic() - self.last_message_mono
 
-        # send reminders
-        relevant_reminder = None
-        for reminder in reminders:
-            if elapsed >= reminder[0] and (
-                self.last_reminder is None or reminder[0] > self.last_reminder
-            ):
-                relevant_reminder = reminder
+        # only refresh once the progress bar moved or someone new joined,
+        # reminders and the end of the challenge are still checked below
+        tick_sig = (int(elapsed * BAR_LENGTH / DURATION), len(self.participants))
+        if tick_sig != self._last_tick_sig:
+            self._last_tick_sig = tick_sig
+            self._dirty = True
 
-        if relevant_reminder is not None:
-            logger.info(f"Sending reminder {relevant_reminder[1]} at {elapsed}")
-
-            channel = cast(
-                discord.TextChannel | None, self.bot.get_channel(self.channel_id)
-            )
-            assert channel is not None
+        # send reminders, they are sorted so only the next one can be due
+        if (
+            self._next_reminder_idx < len(self._reminders)
+            and elapsed >= self._reminders[self._next_reminder_idx][0]
+        ):
+            relevant_reminder = self._reminders[self._next_reminder_idx]
+            logger.info("Sending reminder %s at %s", relevant_reminder[1], elapsed)
 
             reminder_embed = discord.Embed(
                 title="⚠️ Message Train Alert",
-                description=relevant_reminder[1].format(reward=self.reward),
+                description=relevant_reminder[1],
                 color=discord.Color.orange(),
             )
 
@@ -377,30 +505,50 @@ class KeepChannelAlive(commands.Cog):
             )
 
             _ = reminder_embed.add_field(
-                name="Progress", value=self.progress(), inline=False
+                name="Progress", value=self.progress(elapsed), inline=False
             )
 
-            _ = await channel.send(embed=reminder_embed)
-            self.last_reminder = int(relevant_reminder[0])
+            # the reminder and the status edit are independent requests
+            self._dirty = True
+            await send_all(
+                self.channel.send(embed=reminder_embed),
+                self.flush_status_message(),
+            )
 
-        if (datetime.now() - self.last_message).total_seconds() > 60:
+            self._next_reminder_idx += 1
+
+        if elapsed > DURATION:
             await self.distribute_reward()
 
             self.reset()
             return
 
-    async def distribute_reward(self):
-        if self.channel_id is None:
+    @tasks.loop(seconds=1)
+    async def flush_status(self):
+        await self.flush_status_message()
+
+    async def flush_status_message(self):
+        """Edit the status message if anything changed since the last edit"""
+        if not self._dirty:
             return
 
-        channel = cast(
-            discord.TextChannel | None, self.bot.get_channel(self.channel_id)
-        )
-        assert channel is not None
+        async with self._edit_lock:
+            self._dirty = False
 
-        participants = list(self.participants.keys())
+            try:
+                await asyncio.wait_for(
+                    self.update_status_message(), timeout=STATUS_EDIT_TIMEOUT
+                )
+            except TimeoutError:
+                logger.warning("Status message edit timed out, retrying")
+                self._dirty = True
 
-        if not participants:
+    async def distribute_reward(self):
+        channel = self.channel
+        if channel is None:
+            return
+
+        if not self.participants:
             no_winner_embed = discord.Embed(
                 title="😔 Challenge Ended",
                 description="No participants joined the message train challenge.",
@@ -409,22 +557,21 @@ class KeepChannelAlive(commands.Cog):
             _ = await channel.send(embed=no_winner_embed)
             return
 
-        winner_id = random.choice(participants)
+        # every message is a ticket, the more you talk the better your odds
+        winner_id = random.choices(
+            tuple(self.participants), weights=tuple(self.participants.values())
+        )[0]
         try:
             winner = await self.bot.fetch_user(winner_id)
         except discord.NotFound:
             _ = await channel.send(embed=error("No winner could be determined"))
             return
 
-        # Create a list of all participants
-        participant_list: list[str] = []
-        for user_id, count in self.participants.items():
-            if user_id == winner_id:
-                participant_list.append(f"👑 <@{user_id}> - {count} messages")
-            else:
-                participant_list.append(f"<@{user_id}> - {count} messages")
-
-        participants_text = "\n".join(participant_list)
+        # Create a list of all participants, most active first
+        participants_text = "\n".join(
+            f"{'👑 ' if user_id == winner_id else ''}<@{user_id}> - {count} messages"
+            for user_id, count in self.participants.most_common()
+        )
 
         # Create winner announcement embed
         winner_embed = discord.Embed(
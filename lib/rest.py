@@ -0,0 +1,41 @@
+"""
+Helpers for sending requests to the Discord API.
+
+All cogs share one semaphore so bursts (trivia winners, message train
+reminders) don't stack up requests and run into the global rate limit.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+REST_CONCURRENCY: int = int(os.getenv("REST_CONCURRENCY", "4"))
+
+_rest_sem = asyncio.Semaphore(REST_CONCURRENCY)
+
+
+async def bounded(aw: Awaitable[T]) -> T:
+    """Await a Discord request once fewer than REST_CONCURRENCY are in flight."""
+    if _rest_sem.locked():
+        logger.info("REST concurrency limit of %d reached, waiting", REST_CONCURRENCY)
+
+    async with _rest_sem:
+        return await aw
+
+
+async def send_all(*aws: Awaitable[Any]) -> None:
+    """
+    Run independent Discord requests concurrently.
+
+    A failing request is logged and doesn't cancel the others.
+    """
+    results = await asyncio.gather(*(bounded(aw) for aw in aws), return_exceptions=True)
+
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.error("Discord request failed", exc_info=result)
@@ -1,20 +1,51 @@
 import asyncio
+import codecs
 import csv
-import io
+import re
+import time
+from collections import deque
 from dataclasses import dataclass
-from typing import cast
-
-import arrow
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Coroutine,
+    Iterable,
+    Self,
+    override,
+)
+
+import aiohttp
 import discord
 from discord.ext import commands
-from parse import Result, parse  # pyright: ignore[reportUnknownVariableType]
 
+from lib import channel_handlers
 from lib.auth import can_run_bot_commands
 from lib.components.channel_dropdown import ChannelDropdown
 from lib.embeds import error, success
+from lib.rest import bounded, send_all
+
+# 64KB, the attachment is downloaded and parsed in pieces of this size
+DOWNLOAD_CHUNK_SIZE = 65536
+
+# time between questions, e.g. "5m", accepts the same input parse("{:d}m") did
+TIME_BETWEEN_PATTERN = re.compile(r"^\s*\+?(\d+)\s*m\s*$", re.IGNORECASE)
 
+# static embeds, built once instead of on every use
+ALREADY_ACTIVE_EMBED = error("Trivia is already active")
+INVALID_FORMAT_EMBED = error(
+    "Invalid time format. Please use `Xm` (e.g. `5m` for 5 minutes).",
+    title="Invalid Format",
+)
+MISSING_CSV_EMBED = error("Please attach a trivia CSV file!")
+COMPLETE_EMBED = discord.Embed(
+    title="🎊 Trivia Session Complete",
+    description="All questions have been answered! Thanks for playing!",
+    color=discord.Color.green(),
+)
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class TriviaQuestion:
     Question: str
     Answer: str
@@ -28,7 +59,144 @@ class TriviaQuestion:
         ).set_footer(text="Be the first to answer correctly!")
 
 
+async def stream_attachment(attachment: discord.Attachment) -> AsyncIterator[bytes]:
+    """Download an attachment chunk by chunk instead of reading it at once."""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(attachment.url) as response:
+            response.raise_for_status()
+
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                yield chunk
+
+
+def ends_in_quoted_field(line: str, quoted: bool = False) -> bool:
+    """
+    Check if a line ends inside a quoted field, i.e. the record continues on
+    the next line. Follows the quoting rules of csv's default dialect: a quote
+    only starts a quoted field at the start of a field and is a literal
+    character anywhere else.
+
+    :param line: The line, including its line break.
+    :param quoted: Whether the line starts inside a quoted field.
+
+    >>> ends_in_quoted_field('How long is a 5" gun?,12.7cm,1\\n')
+    False
+    >>> ends_in_quoted_field('"Name the\\n')
+    True
+    >>> ends_in_quoted_field('ship class",Yamato,1\\n', quoted=True)
+    False
+    """
+    in_quotes = quoted
+    # true at the start of a field, and right after a quote closing quoted text
+    quote_opens = not quoted
+
+    for c in line:
+        if in_quotes:
+            if c == '"':
+                in_quotes = False
+                quote_opens = True
+        elif c == '"' and quote_opens:
+            # opens a quoted field, or is an escaped quote ("")
+            in_quotes = True
+        else:
+            quote_opens = c == ","
+
+    return in_quotes
+
+
+async def iter_csv_records(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """
+    Decode UTF-8 chunks incrementally and yield complete CSV records.
+
+    A record spans several lines if a quoted field contains line breaks.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    # how far pending was searched for line ends, and whether that's in quotes
+    scanned = 0
+    quoted = False
+
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+
+        while (end := pending.find("\n", scanned)) != -1:
+            quoted = ends_in_quoted_field(pending[scanned : end + 1], quoted)
+            scanned = end + 1
+
+            if not quoted:
+                yield pending[:scanned]
+                pending = pending[scanned:]
+                scanned = 0
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+class RecordQueue(deque[str]):
+    """
+    Feeds queued records to a csv.reader.
+
+    Running out of records ends the current row instead of failing, csv then
+    closes a quoted field that is never terminated at the end of the file.
+    """
+
+    @override
+    def __iter__(self) -> Self:
+        return self
+
+    def __next__(self) -> str:
+        if not self:
+            raise StopIteration
+        return self.popleft()
+
+
+async def load_trivia_csv(
+    chunks: AsyncIterable[bytes],
+) -> AsyncIterator[TriviaQuestion]:
+    """Parse a trivia CSV record by record while it is being downloaded."""
+    records = RecordQueue()
+    # records are complete, so each row takes exactly one of them
+    reader = csv.reader(records)
+    columns: tuple[int, int, int] | None = None
+
+    async for record in iter_csv_records(chunks):
+        records.append(record)
+        row = next(reader)
+
+        # blank line
+        if not row:
+            continue
+
+        if columns is None:
+            columns = (
+                row.index("Question"),
+                row.index("Answer"),
+                row.index("Reward"),
+            )
+            continue
+
+        qi, ai, ri = columns
+        yield TriviaQuestion(Question=row[qi], Answer=row[ai], Reward=row[ri])
+
+
 class TriviaSession:
+    __slots__: tuple[str, ...] = (
+        "active",
+        "channel",
+        "bot",
+        "questions",
+        "current_question",
+        "time_between",
+        "next_question_message",
+        "_answers",
+        "_next_question_handle",
+        "_pending",
+        "_locked_overwrite",
+        "_unlocked_overwrite",
+        "_locked",
+    )
+
     active: bool
     channel: discord.TextChannel | None
     bot: commands.Bot
@@ -36,25 +204,45 @@ class TriviaSession:
     current_question: int
     time_between: int
     next_question_message: discord.Message | None
+    # (length, lowercased answer) per question, checked on every message
+    _answers: list[tuple[int, str]]
+    # wakes the session up for the next question, see wait_and_continue_task
+    _next_question_handle: asyncio.TimerHandle | None
+    # keeps running tasks referenced so they aren't garbage collected
+    _pending: set[asyncio.Task[None]]
+    # @everyone overwrites for the channel, built once in start()
+    _locked_overwrite: discord.PermissionOverwrite | None
+    _unlocked_overwrite: discord.PermissionOverwrite | None
+    _locked: bool | None
 
     def __init__(
-        self, bot: commands.Bot, questions: list[TriviaQuestion], time_between: int
+        self,
+        bot: commands.Bot,
+        questions: Iterable[TriviaQuestion],
+        time_between: int,
     ):
         """
         A trivia session that contains a list of questions and the time between questions.
 
         :param bot: The bot instance.
-        :param questions: A list of trivia questions.
+        :param questions: The trivia questions, e.g. from load_trivia_csv.
         :param time_between: The time between questions in minutes.
         """
 
         self.active = False
         self.channel = None
         self.bot = bot
-        self.questions = questions
+        # start_trivia already collects a list, don't copy it again
+        self.questions = questions if isinstance(questions, list) else list(questions)
+        self._answers = [(len(q.Answer), q.Answer.lower()) for q in self.questions]
         self.current_question = 0
         self.time_between = time_between
         self.next_question_message = None
+        self._next_question_handle = None
+        self._pending = set()
+        self._locked_overwrite = None
+        self._unlocked_overwrite = None
+        self._locked = None
 
     def get_current_question(self) -> TriviaQuestion:
         return self.questions[self.current_question]
@@ -66,21 +254,31 @@ class TriviaSession:
         self.current_question += 1
 
     def is_answer_correct(self, answer: str) -> bool:
-        return answer.lower() == self.get_current_question().Answer.lower()
+        length, expected = self._answers[self.current_question]
 
-    async def lock_channel(self):
+        # most chat messages differ in length, skip lowercasing those
+        return len(answer) == length and answer.lower() == expected
+
+    async def set_locked(self, locked: bool):
         assert self.channel is not None
 
-        await self.channel.set_permissions(
-            self.channel.guild.default_role, send_messages=False
-        )
+        # skip the request if the channel is already in the requested state
+        if self._locked == locked:
+            return
 
-    async def unlock_channel(self):
-        assert self.channel is not None
+        overwrite = self._locked_overwrite if locked else self._unlocked_overwrite
+        assert overwrite is not None
 
         await self.channel.set_permissions(
-            self.channel.guild.default_role, send_messages=True
+            self.channel.guild.default_role, overwrite=overwrite
         )
+        self._locked = locked
+
+    async def lock_channel(self):
+        await self.set_locked(True)
+
+    async def unlock_channel(self):
+        await self.set_locked(False)
 
     async def post_question(self):
         if not self.channel:
@@ -92,16 +290,29 @@ class TriviaSession:
         await self.unlock_channel()
 
         # Send question number info along with the embed
-        _ = await self.channel.send(
-            f"**Question {self.current_question + 1}/{len(self.questions)}**",
-            embed=embed,
+        _ = await bounded(
+            self.channel.send(
+                f"**Question {self.current_question + 1}/{len(self.questions)}**",
+                embed=embed,
+            )
         )
 
     async def start(self, channel: discord.TextChannel):
         self.channel = channel
         self.active = True
 
-        next_ts = round(arrow.utcnow().shift(minutes=self.time_between).timestamp())
+        # keep whatever else the @everyone overwrite allows or denies
+        overwrite = channel.overwrites_for(channel.guild.default_role)
+        self._locked_overwrite = discord.PermissionOverwrite.from_pair(
+            *overwrite.pair()
+        )
+        self._locked_overwrite.send_messages = False
+        self._unlocked_overwrite = discord.PermissionOverwrite.from_pair(
+            *overwrite.pair()
+        )
+        self._unlocked_overwrite.send_messages = True
+
+        next_ts = int(time.time() + self.time_between * 60)
 
         # Send a welcome message
         welcome_embed = discord.Embed(
@@ -119,7 +330,7 @@ class TriviaSession:
 
         assert self.channel is not None
 
-        next_ts = round(arrow.utcnow().shift(minutes=self.time_between).timestamp())
+        next_ts = int(time.time() + self.time_between * 60)
 
         if self.current_question > 0:
             waiting_embed = discord.Embed(
@@ -131,8 +342,20 @@ class TriviaSession:
             self.next_question_message = await self.channel.send(embed=waiting_embed)
 
         await self.lock_channel()
-        await asyncio.sleep(self.time_between * 60)
 
+        if not self.active:
+            return
+
+        # a timer instead of sleeping keeps no task around between questions
+        self._next_question_handle = asyncio.get_running_loop().call_later(
+            self.time_between * 60, self.fire_next_question
+        )
+
+    def fire_next_question(self):
+        self._next_question_handle = None
+        self.spawn(self.advance())
+
+    async def advance(self):
         if not self.active:
             return
 
@@ -142,8 +365,24 @@ class TriviaSession:
 
         await self.post_question()
 
+    def spawn(self, coro: Coroutine[Any, Any, None]):
+        task = asyncio.create_task(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
     def wait_and_continue(self):
-        _ = asyncio.create_task(self.wait_and_continue_task())
+        self.spawn(self.wait_and_continue_task())
+
+    def stop(self):
+        """End the session, cancelling the wait for the next question."""
+        self.active = False
+
+        if self._next_question_handle is not None:
+            self._next_question_handle.cancel()
+            self._next_question_handle = None
+
+        for task in self._pending:
+            _ = task.cancel()
 
 
 class Trivia(commands.Cog):
@@ -164,21 +403,14 @@ class Trivia(commands.Cog):
         self.next_question_message = None
         self.winners_thread = None
 
-    def load_trivia_csv(self, data: bytes) -> list[TriviaQuestion]:
-        trivia: list[TriviaQuestion] = []
-
-        reader = csv.DictReader(io.StringIO(data.decode("utf-8")))
-
-        for row in reader:
-            trivia.append(
-                TriviaQuestion(
-                    Question=row["Question"],
-                    Answer=row["Answer"],
-                    Reward=row["Reward"],
-                )
-            )
+    @override
+    async def cog_unload(self) -> None:
+        # don't leave a timer, tasks or a handler behind for a session nobody listens to
+        if self.session is not None:
+            self.session.stop()
 
-        return trivia
+        if self.channel_id is not None:
+            channel_handlers.unregister(self.channel_id, self.on_channel_message)
 
     @commands.command()
     @commands.check(can_run_bot_commands)
@@ -189,31 +421,29 @@ class Trivia(commands.Cog):
         time_between_questions: str,  # type: ignore
     ) -> None:
         if self.active:
-            _ = await ctx.send(embed=error("Trivia is already active"))
+            _ = await ctx.send(embed=ALREADY_ACTIVE_EMBED)
             return
 
-        parts = parse("{duration:d}m", time_between_questions)
+        match = TIME_BETWEEN_PATTERN.match(time_between_questions)
 
-        if parts is None or not isinstance(parts, Result) or "duration" not in parts:
-            _ = await ctx.send(
-                embed=error(
-                    "Invalid time format. Please use `Xm` (e.g. `5m` for 5 minutes).",
-                    title="Invalid Format",
-                )
-            )
+        if match is None:
+            _ = await ctx.send(embed=INVALID_FORMAT_EMBED)
             return
 
-        time_between = cast(int, parts["duration"])
+        time_between = int(match.group(1))
 
         if len(ctx.message.attachments) == 0:
-            _ = await ctx.send(embed=error("Please attach a trivia CSV file!"))
+            _ = await ctx.send(embed=MISSING_CSV_EMBED)
             return
 
         try:
-            data = await ctx.message.attachments[0].read()
-            self.session = TriviaSession(
-                self.bot, self.load_trivia_csv(data), time_between
-            )
+            questions = [
+                question
+                async for question in load_trivia_csv(
+                    stream_attachment(ctx.message.attachments[0])
+                )
+            ]
+            self.session = TriviaSession(self.bot, questions, time_between)
         except Exception as e:
             _ = await ctx.send(
                 embed=error(f"An error occurred while loading the trivia: {e}")
@@ -264,7 +494,15 @@ class Trivia(commands.Cog):
         if not self.session:
             return
 
+        # a second !start_trivia can leave another dropdown around
+        if self.active:
+            _ = await interaction.response.send_message(
+                embed=ALREADY_ACTIVE_EMBED, ephemeral=True
+            )
+            return
+
         self.channel_id = channel.id
+        channel_handlers.register(channel.id, self.on_channel_message)
         self.active = True
         self.initial_message = interaction.message
 
@@ -273,40 +511,27 @@ class Trivia(commands.Cog):
             description=f"Trivia session is starting in {channel.mention}!",
             color=discord.Color.green(),
         )
-        message = await interaction.response.send_message(embed=start_embed)
+        _ = await interaction.response.send_message(embed=start_embed)
 
-        assert interaction.channel is not None
-        assert message.message_id is not None
-
-        # retrieve message to create thread
-        # Cast to TextChannel since we know it's a text channel from the context
-        channel = cast(discord.TextChannel, interaction.channel)
-        message = await channel.fetch_message(message.message_id)  # type: ignore[attr-defined]
-
-        self.winners_thread = await message.create_thread(
+        # the thread doesn't need the start message as an anchor, creating it
+        # on the channel saves looking the message up first
+        assert isinstance(interaction.channel, discord.TextChannel)
+        self.winners_thread = await interaction.channel.create_thread(
             name="Trivia Winners",
+            type=discord.ChannelType.public_thread,
             auto_archive_duration=1440,  # 24 hours
         )
 
         await self.session.start(channel)
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        if not self.active:
-            return
-
-        if not self.session:
-            return
-
-        if message.channel.id != self.channel_id:
-            return
-
+    async def on_channel_message(self, message: discord.Message):
+        # only registered for the trivia channel while a session is active
         if message.author.bot:
             return
 
-        if self.session.is_answer_correct(message.content):
-            await message.add_reaction("✅")
+        assert self.session is not None
 
+        if self.session.is_answer_correct(message.content):
             current_question = self.session.get_current_question()
 
             winner_embed = discord.Embed(
@@ -318,8 +543,6 @@ class Trivia(commands.Cog):
                 name="Prize", value=f"**{current_question.Reward}**", inline=False
             )
 
-            _ = await message.reply(embed=winner_embed)
-
             assert self.winners_thread is not None
 
             admin_winner_embed = discord.Embed(
@@ -339,28 +562,29 @@ class Trivia(commands.Cog):
                 inline=False,
             )
 
-            _ = await self.winners_thread.send(embed=admin_winner_embed)
+            await send_all(
+                message.add_reaction("✅"),
+                message.reply(embed=winner_embed),
+                self.winners_thread.send(embed=admin_winner_embed),
+            )
 
             if self.session.has_next_question():
                 self.session.next_question()
                 self.session.wait_and_continue()
                 return
 
-            complete_embed = discord.Embed(
-                title="🎊 Trivia Session Complete",
-                description="All questions have been answered! Thanks for playing!",
-                color=discord.Color.green(),
-            )
-
-            _ = await message.channel.send(embed=complete_embed)
+            assert self.initial_message is not None
 
-            # Send completion message to the thread
-            assert self.winners_thread is not None
-            _ = await self.winners_thread.send(embed=complete_embed)
+            await send_all(
+                message.channel.send(embed=COMPLETE_EMBED),
+                # Send completion message to the thread
+                self.winners_thread.send(embed=COMPLETE_EMBED),
+                # Also notify in the original channel
+                self.initial_message.reply(embed=COMPLETE_EMBED),
+            )
 
-            # Also notify in the original channel
-            assert self.initial_message is not None
-            _ = await self.initial_message.reply(embed=complete_embed)
+            self.session.stop()
+            channel_handlers.unregister(message.channel.id, self.on_channel_message)
 
             self.active = False
             self.session = None
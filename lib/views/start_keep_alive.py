@@ -8,38 +8,38 @@ Discord view for Start the 'Keep Alive' feature
 from typing import Awaitable, Callable, Optional
 
 import discord
-from discord.ui import Button, Select, TextInput, View
+from discord.ui import Button, Select, View
+
+from lib.components.channel_dropdown import channel_options
 
 
 class StartKeepChannelAliveView(View):
     def __init__(
         self,
         reward: str,
-        channels: list[discord.TextChannel],
+        channels: list[discord.TextChannel] | None = None,
+        *,
         callback: Callable[
             [discord.Interaction, discord.TextChannel, str],
             Awaitable[None],
         ],
         placeholder: str = "Select a channel for the message train",
         timeout: float = 180.0,
+        options: Optional[list[discord.SelectOption]] = None,
     ):
         super().__init__(timeout=timeout)
 
         self.reward = reward
 
+        if options is None:
+            options = channel_options(channels or [])
+
         # Create the dropdown menu
         self.dropdown = Select(
             placeholder=placeholder,
             min_values=1,
             max_values=1,
-            options=[
-                discord.SelectOption(
-                    label=channel.name,
-                    value=str(channel.id),
-                    description=f"#{channel.name}",
-                )
-                for channel in channels[:25]  # Discord limits to 25 options
-            ],
+            options=list(options),
         )
         self.dropdown.callback = self.on_select
         self.add_item(self.dropdown)
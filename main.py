@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from typing import override
 
@@ -5,6 +6,7 @@ import discord
 import sentry_sdk
 from discord.ext import commands
 import config
+from lib import channel_handlers
 
 _ = sentry_sdk.init(
     dsn="https://f4940923ec4141ec45110af22b275bf5@o283081.ingest.us.sentry.io/4509056289538048",
@@ -39,9 +41,18 @@ class WowsDiscordBot(commands.Bot):
     @override
     async def setup_hook(self) -> None:
         # pass configuration
+        await self.load_extension("lib.auth")
         await self.load_extension("lib.keep_channel_alive")
         await self.load_extension("lib.trivia")
 
+    @override
+    async def on_message(self, message: discord.Message, /) -> None:
+        # cogs only get the messages of the channels they are active in, and
+        # don't wait for a command in that channel to finish
+        _ = await asyncio.gather(
+            self.process_commands(message), channel_handlers.dispatch(message)
+        )
+
     # handle command errors
     @override
     async def on_command_error(